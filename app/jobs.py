@@ -6,67 +6,205 @@ import logging
 from pathlib import Path
 
 from app.utils.exifparser import extractExif
-from app.utils.caption import extractCaption
+from rq import Queue, get_current_job
+from rq.job import JobStatus
+
+from app.utils.caption import captionImages, extractCaption, loadCaptionImage
+from app.utils.phash import computePhash
 from app.utils.thumbnail import generateThumbnail
 
 DB_PATH = Path(os.getenv("DB_PATH", "/srv/database.db"))
+CAPTION_BATCH_SIZE = int(os.getenv("CAPTION_BATCH_SIZE", "8"))
+CAPTION_BATCH_THRESHOLD = int(os.getenv("CAPTION_BATCH_THRESHOLD", "8"))
+# a claim older than this belongs to a worker that died mid-caption
+CAPTION_CLAIM_TTL_S = int(os.getenv("CAPTION_CLAIM_TTL_S", "600"))
+CAPTION_BATCH_JOB_ID = "caption-batch"
+
+_CAPTION_PENDING = (
+    "caption IS NULL AND caption_error IS NULL "
+    "AND (caption_claimed_at IS NULL OR caption_claimed_at < datetime('now', ?))"
+)
 
 logger = logging.getLogger("worker.jobs")
 
-def exif_job(sha256: str, image_path: str) -> None:
-    logger.info("exif_job_start sha256=%s image_path=%s", sha256, image_path)
+def _save_caption(conn: sqlite3.Connection, sha256: str, image_id: str, caption: str) -> None:
+    conn.execute(
+        "UPDATE metadata SET caption = ? WHERE sha256 = ?",
+        (caption, sha256),
+    )
+    conn.execute(
+        """
+        UPDATE stats
+        SET status = ?, end_time = datetime('now')
+        WHERE image_id = ?
+        """,
+        (1, image_id),
+    )
+    
+    conn.execute(
+        """
+        UPDATE images
+        SET processed_at = datetime('now')
+        WHERE image_id = ?
+        """,
+        (image_id,)
+    )
 
-    try:
-        exif_json = extractExif(Path(image_path))
-        logger.info("exif_extracted sha256=%s exif_len=%s", sha256, len(exif_json or ""))
+def _claim_ttl() -> str:
+    return f"-{CAPTION_CLAIM_TTL_S} seconds"
+
+def _claim_caption(sha256: str) -> bool:
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute(
+            f"UPDATE metadata SET caption_claimed_at = datetime('now') WHERE sha256 = ? AND {_CAPTION_PENDING}",
+            (sha256, _claim_ttl()),
+        )
+        conn.commit()
+    return cur.rowcount == 1
+
+def _claim_captions(limit: int) -> list[tuple[str, str, str]]:
+    with sqlite3.connect(DB_PATH) as conn:
+        # select and claim under one write lock so concurrent batch jobs never share rows
+        conn.execute("BEGIN IMMEDIATE")
+        # MIN(i.rowid) picks the first upload of each sha256, the one whose stats row is pending
+        rows = conn.execute(
+            f"""
+            SELECT m.sha256, i.image_path, i.image_id, MIN(i.rowid)
+            FROM metadata m
+            JOIN images i ON i.metadata_sha256 = m.sha256
+            WHERE {_CAPTION_PENDING}
+            GROUP BY m.sha256
+            LIMIT ?
+            """,
+            (_claim_ttl(), limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE metadata SET caption_claimed_at = datetime('now') WHERE sha256 = ?",
+            [(sha256,) for sha256, _, _, _ in rows],
+        )
+        conn.commit()
+    return [(sha256, image_path, image_id) for sha256, image_path, image_id, _ in rows]
+
+def caption_batch_job(limit: int = CAPTION_BATCH_SIZE) -> int:
+    done = 0
+    # drain the backlog, so one queued batch job covers every upload made while it runs
+    while rows := _claim_captions(limit):
+        logger.info("caption_batch_job_start size=%s", len(rows))
+        images, loaded, failed = [], [], []
+        for sha256, image_path, image_id in rows:
+            try:
+                images.append(loadCaptionImage(Path(image_path)))
+                loaded.append((sha256, image_id))
+            except Exception as e:
+                # an unreadable image is recorded and dropped, it must not block the rest of the batch
+                logger.warning("caption_load_failed sha256=%s image_path=%s error=%r", sha256, image_path, e)
+                failed.append((str(e) or type(e).__name__, sha256))
+
+        captions = captionImages(images) if images else []
 
         with sqlite3.connect(DB_PATH) as conn:
             conn.execute("PRAGMA foreign_keys = ON;")
-            cur = conn.execute(
-                "UPDATE metadata SET exif_json = ? WHERE sha256 = ?",
-                (exif_json, sha256),
-            )
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("UPDATE metadata SET caption_error = ? WHERE sha256 = ?", failed)
+            for (sha256, image_id), caption in zip(loaded, captions):
+                _save_caption(conn, sha256, image_id, caption)
             conn.commit()
 
-        logger.info("exif_db_updated sha256=%s rows_updated=%s", sha256, cur.rowcount)
+        logger.info("caption_batch_job_done size=%s failed=%s", len(loaded), len(failed))
+        done += len(loaded)
+    return done
 
-    except Exception:
-        logger.exception("exif_job_failed sha256=%s image_path=%s", sha256, image_path)
-        raise
-    
-def caption_job(sha256: str, image_path: str, image_id: str)-> None:
-    caption = extractCaption(Path(image_path))
-    with sqlite3.connect(DB_PATH) as conn:
+def enqueue_caption_batch(q: Queue) -> None:
+    # a batch job still waiting in the queue will pick up this image too
+    job = q.fetch_job(CAPTION_BATCH_JOB_ID)
+    if job is not None and job.get_status() == JobStatus.QUEUED:
+        return
+    q.enqueue(caption_batch_job, job_id=CAPTION_BATCH_JOB_ID)
+
+def _current_queue() -> Queue | None:
+    job = get_current_job()
+    return Queue(job.origin, connection=job.connection) if job is not None else None
+
+def _defer_to_caption_batch() -> bool:
+    # checked in the worker, not at upload, so the API makes one redis round trip per upload
+    q = _current_queue()
+    if q is None or q.count < CAPTION_BATCH_THRESHOLD:
+        return False
+    # under a backlog, leave captioning to one batched forward pass over pending images
+    enqueue_caption_batch(q)
+    return True
+
+def process_image_job(sha256: str, image_path: str, image_id: str) -> None:
+    logger.info("process_image_job_start sha256=%s image_path=%s", sha256, image_path)
+    try:
+        path = Path(image_path)
+        # exifread only reads the EXIF segment, so the original is decoded once, for the thumbnails
+        exif_json = extractExif(path)
+
+        thumbs, phash = None, None
+        try:
+            thumbs = generateThumbnail(path, sha256)
+            # 32x32 grayscale is all pHash needs: hash the small thumbnail, not the original
+            phash = computePhash(Path(thumbs["small"]))
+        except Exception:
+            # e.g. a truncated upload: EXIF is still saved, phash stays NULL
+            logger.exception("thumbnail_failed sha256=%s image_path=%s", sha256, image_path)
+
+        # BLIP resizes to 384px anyway: caption the medium thumbnail instead of decoding the original again
+        text = None
+        claimed = not _defer_to_caption_batch() and _claim_caption(sha256)
+        if claimed:
+            try:
+                text = extractCaption(Path(thumbs["medium"]) if thumbs else path)
+            except Exception:
+                # EXIF and pHash are still saved; the caption stays NULL for caption_batch_job
+                logger.exception("caption_failed sha256=%s image_path=%s", sha256, image_path)
+
+        with sqlite3.connect(DB_PATH) as conn:
             conn.execute("PRAGMA foreign_keys = ON;")
-            cur = conn.execute(
-                "UPDATE metadata SET caption = ? WHERE sha256 = ?",
-                (caption, sha256),
-            )
-            conn.execute(
-                """
-                UPDATE stats
-                SET status = ?, end_time = datetime('now')
-                WHERE image_id = ?
-                """,
-                (1, image_id),
-            )
-            
+            conn.execute("BEGIN IMMEDIATE")
             conn.execute(
-                """
-                UPDATE images
-                SET processed_at = datetime('now')
-                WHERE image_id = ?
-                """,
-                (image_id,)
+                "UPDATE metadata SET exif_json = ?, phash = ? WHERE sha256 = ?",
+                (exif_json, phash, sha256),
             )
+            if text is not None:
+                _save_caption(conn, sha256, image_id, text)
+            else:
+                if claimed:
+                    conn.execute("UPDATE metadata SET caption_claimed_at = NULL WHERE sha256 = ?", (sha256,))
+                if thumbs is None:
+                    # processing ended without thumbnails; a later caption overwrites end_time
+                    conn.execute(
+                        "UPDATE stats SET end_time = datetime('now') WHERE image_id = ?",
+                        (image_id,),
+                    )
             conn.commit()
 
-def thumbnail_job(sha256: str, image_path: str)-> None:
-    logger.info("thumbnail_job_start sha256=%s image_path=%s", sha256, image_path)
-    try:
-        generateThumbnail(Path(image_path),sha256)
-        logger.info("thumbnail_made sha256=%s", sha256)
+        if claimed and text is None and (q := _current_queue()) is not None:
+            enqueue_caption_batch(q)
+
+        logger.info("process_image_job_done sha256=%s captioned=%s", sha256, text is not None)
     except Exception:
-        logger.exception("thumbnail_job_fail sha256=%s image_path=%s", sha256, image_path)
+        logger.exception("process_image_job_failed sha256=%s image_path=%s", sha256, image_path)
         raise
-    
+
+# jobs enqueued before the fused job existed still drain through these; they share its
+# code path, including the caption claim, so they cannot race caption_batch_job
+def _first_image_id(sha256: str) -> str | None:
+    with sqlite3.connect(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT image_id FROM images WHERE metadata_sha256 = ? ORDER BY rowid LIMIT 1",
+            (sha256,),
+        ).fetchone()
+    return row[0] if row else None
+
+def exif_job(sha256: str, image_path: str) -> None:
+    if (image_id := _first_image_id(sha256)) is not None:
+        process_image_job(sha256, image_path, image_id)
+
+def thumbnail_job(sha256: str, image_path: str) -> None:
+    exif_job(sha256, image_path)
+
+def caption_job(sha256: str, image_path: str, image_id: str) -> None:
+    process_image_job(sha256, image_path, image_id)
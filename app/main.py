@@ -1,24 +1,28 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
+import queue
 import sqlite3
 import sys
 import time
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 from uuid import uuid4
 
+import orjson
 from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response
 from redis import Redis
 from rq import Queue
 
-from app.jobs import caption_job, exif_job, thumbnail_job
-from app.utils.validator import validate
+from app.jobs import process_image_job
+from app.utils.phash import hamming
+from app.utils.validator import ValidatedUpload, validate
 
 logging.basicConfig(
     level=logging.INFO,
@@ -34,18 +38,58 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
 ALLOWED_CONTENT_TYPES = {"image/png", "image/jpeg"}
 MAX_BYTES = 100 * 1024 * 1024 #100mb
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+THUMBS_ACCEL_PREFIX = os.getenv("THUMBS_ACCEL_PREFIX", "").rstrip("/")
+NEAR_MAX_DISTANCE = 8
 
+@lru_cache(maxsize=1)
 def get_queue() -> Queue:
     return Queue("image-jobs", connection=Redis.from_url(REDIS_URL))
 
+_POOL: queue.Queue[sqlite3.Connection] = queue.Queue()
+
 def connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA mmap_size = 268435456;")
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.create_function("hamming", 2, hamming, deterministic=True)
     return conn
 
+@contextmanager
+def get_conn() -> Iterator[sqlite3.Connection]:
+    conn = _POOL.get()
+    try:
+        with conn:
+            yield conn
+    finally:
+        _POOL.put(conn)
+
+def fetch_all(sql: str, params: tuple[Any, ...] = ()) -> list[sqlite3.Row]:
+    with get_conn() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def fetch_one(sql: str, params: tuple[Any, ...] = ()) -> sqlite3.Row | None:
+    with get_conn() as conn:
+        return conn.execute(sql, params).fetchone()
+
+def open_pool(size: int = DB_POOL_SIZE) -> None:
+    for _ in range(size):
+        _POOL.put(connect())
+
+def close_pool() -> None:
+    while True:
+        try:
+            _POOL.get_nowait().close()
+        except queue.Empty:
+            break
+
 def init() -> None:
-    with connect() as conn:
+    open_pool()
+    with get_conn() as conn:
         conn.executescript(
             """
             CREATE TABLE IF NOT EXISTS metadata (
@@ -56,7 +100,10 @@ def init() -> None:
                 size_bytes INTEGER,
                 first_upload TEXT DEFAULT (datetime('now')),
                 exif_json TEXT,
-                caption TEXT
+                caption TEXT,
+                phash INTEGER,
+                caption_claimed_at TEXT,
+                caption_error TEXT
             );
 
             CREATE TABLE IF NOT EXISTS images (
@@ -82,13 +129,21 @@ def init() -> None:
 
             CREATE INDEX IF NOT EXISTS idx_images_metadata_sha256
             ON images(metadata_sha256);
+
+            CREATE INDEX IF NOT EXISTS idx_images_processed_at
+            ON images(processed_at DESC, image_id, metadata_sha256, original_name, error);
             """
         )
+        # databases created before these columns existed
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(metadata)")}
+        for name, decl in (("phash", "INTEGER"), ("caption_claimed_at", "TEXT"), ("caption_error", "TEXT")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE metadata ADD COLUMN {name} {decl}")
         conn.commit()
         
 def build_item(
     *,
-    request: Request,
+    base: str,
     status: str,
     image_id: str,
     original_name: str,
@@ -96,7 +151,6 @@ def build_item(
     error: str | None = None,
     metadata: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
-    base = str(request.base_url).rstrip("/")
     thumbs = (
         {
             "small": f"{base}/api/images/{image_id}/thumbnails/small",
@@ -119,13 +173,18 @@ def build_item(
     }
 
         
+class OrjsonResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init()
     yield
+    close_pool()
     
 
-app = FastAPI(title="Image Upload", lifespan=lifespan)
+app = FastAPI(title="Image Upload", lifespan=lifespan, default_response_class=OrjsonResponse)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -135,6 +194,81 @@ async def log_requests(request: Request, call_next):
     logger.info("%s %s -> %s (%.1fms)", request.method, request.url.path, response.status_code, ms)
     return response
 
+def record_failure(image_id: str, original_name: str, err_msg: str) -> None:
+    with get_conn() as conn:
+        conn.execute("BEGIN")
+        conn.execute(
+            """
+            INSERT INTO images (image_id, original_name, error)
+            VALUES (?, ?, ?)
+            """,
+            (image_id, original_name, err_msg),
+        )
+        
+        conn.execute(
+            """
+            INSERT INTO stats (image_id, status)
+            VALUES (?,?)
+            """,
+            (image_id, 0)
+            )
+        conn.commit()
+
+def dedupe_original(sha256: str, image_id: str, destination: Path) -> bool:
+    row = fetch_one(
+        """
+        SELECT image_path FROM images
+        WHERE metadata_sha256 = ? AND image_id != ? AND image_path IS NOT NULL
+        ORDER BY rowid LIMIT 1
+        """,
+        (sha256, image_id),
+    )
+    if not row:
+        return False
+    # content already stored: swap the fresh copy for a hardlink so duplicates share one inode
+    tmp = destination.with_name(f".{destination.name}.link")
+    try:
+        os.link(row["image_path"], tmp)
+        os.replace(tmp, destination)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        logger.warning("dedupe_link_failed sha256=%s canonical=%s", sha256, row["image_path"])
+        return False
+    return True
+
+def record_success(
+    image_id: str,
+    original_name: str,
+    processed_at: str,
+    image_path: str,
+    v: ValidatedUpload,
+) -> bool:
+    with get_conn() as conn:
+        conn.execute("BEGIN")
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO metadata (sha256,width,height,format,size_bytes) VALUES (?,?,?,?,?)",
+            (v.sha256,v.width,v.height,v.format, v.size),
+        )
+        is_new = cur.rowcount != 0
+        conn.execute(
+            "INSERT INTO images (image_id, original_name, processed_at, image_path, metadata_sha256) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (image_id, original_name, processed_at, image_path, v.sha256),
+        )
+        conn.execute(
+                """
+                INSERT INTO stats (image_id, status)
+                VALUES (?,?)
+                """,
+                (image_id, 1)
+        )
+        conn.commit()
+    return is_new
+
+def enqueue_jobs(sha256: str, image_path: str, image_id: str) -> None:
+    # enqueue_many writes the job through a single redis pipeline; the worker decides on batching
+    get_queue().enqueue_many([Queue.prepare_data(process_image_job, (sha256, image_path, image_id))])
+
 @app.post("/api/images")
 async def upload_img(request: Request, file: UploadFile = File(...)):
     original_name = (file.filename or "upload")
@@ -145,79 +279,42 @@ async def upload_img(request: Request, file: UploadFile = File(...)):
     
     destination = MEDIA_DIR / "originals" / stored_filename
     processed_at = datetime.now(timezone.utc).isoformat()
+    destination.parent.mkdir(parents=True, exist_ok=True)
     try:
-        v = await validate(file)
+        v = await validate(file, destination, max_bytes=MAX_BYTES)
+    except OSError:
+        raise HTTPException(500,"Failed to save image")
     except HTTPException as e:
         err_msg = str(e.detail)
-        with connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO images (image_id, original_name, error)
-                VALUES (?, ?, ?)
-                """,
-                (image_id, original_name, err_msg),
-            )
-            
-            conn.execute(
-                """
-                INSERT INTO stats (image_id, status)
-                VALUES (?,?)
-                """,
-                (image_id, 0)
-                )
-            conn.commit()
+        await run_in_threadpool(record_failure, image_id, original_name, err_msg)
 
         return build_item(
-            request=request,
+            base=str(request.base_url).rstrip("/"),
             status="failed",
             image_id=image_id,
             original_name=original_name,
             processed_at=processed_at,
             error=err_msg,
         )
-    data = v.bytes
-    try:
-        destination.parent.mkdir(parents=True, exist_ok=True)
-        destination.write_bytes(data)
-    except Exception:
-        destination.unlink(missing_ok=True)
-        raise HTTPException(500,"Failed to save image")
-    
     image_path = str(destination)
-    size = len(data)
+    size = v.size
     
-    with connect() as conn:
-        cur = conn.execute(
-            "INSERT OR IGNORE INTO metadata (sha256,width,height,format,size_bytes) VALUES (?,?,?,?,?)",
-            (v.sha256,v.width,v.height,v.format, size),
-        )
-        if cur.rowcount == 0:
-            pass
-        else:
-            try:
-                q = get_queue()
-                q.enqueue(thumbnail_job, v.sha256, image_path)
-                q.enqueue(exif_job, v.sha256, image_path)
-                q.enqueue(caption_job, v.sha256, image_path, image_id)
-            except Exception:
-                logger.exception("failed_to_enqueue sha256=%s image_id=%s", v.sha256, image_id)
+    is_new = await run_in_threadpool(
+        record_success, image_id, original_name, processed_at, image_path, v
+    )
 
+    # enqueue after commit so workers never see uncommitted rows
+    if is_new:
+        try:
+            await run_in_threadpool(enqueue_jobs, v.sha256, image_path, image_id)
+        except Exception:
+            logger.exception("failed_to_enqueue sha256=%s image_id=%s", v.sha256, image_id)
+    else:
+        # only a known sha256 has a stored copy to link against
+        await run_in_threadpool(dedupe_original, v.sha256, image_id, destination)
 
-        conn.execute(
-            "INSERT INTO images (image_id, original_name, processed_at, image_path, metadata_sha256) "
-            "VALUES (?, ?, ?, ?, ?)",
-            (image_id, original_name, processed_at, image_path, v.sha256),
-        )
-        conn.execute(
-                """
-                INSERT INTO stats (image_id, status)
-                VALUES (?,?)
-                """,
-                (image_id, 1)
-        )
-        conn.commit()
     return build_item(
-    request=request,
+        base=str(request.base_url).rstrip("/"),
         status="success",
         image_id=image_id,
         original_name=original_name,
@@ -232,204 +329,234 @@ async def upload_img(request: Request, file: UploadFile = File(...)):
         },
     )
     
-@app.get("/api/images")
-def list_images(request: Request) -> list[dict[str, Any]]:
-    with connect() as conn:
-        rows = conn.execute(
-            """
-            SELECT
-                i.image_id,
-                i.original_name,
-                i.processed_at,
-                i.metadata_sha256,
-                i.error AS err_msg,
-                m.width,
-                m.height,
-                m.format,
-                m.size_bytes,
-                m.first_upload,
-                m.caption,
-                m.exif_json
-            FROM images i
-            LEFT JOIN metadata m ON m.sha256 = i.metadata_sha256
-            ORDER BY i.processed_at DESC
-            """
-        ).fetchall()
-
-    base = str(request.base_url).rstrip("/")
-    items: list[dict[str, Any]] = []
-
-    for r in rows:
-        image_id = r["image_id"]
-
-        if r["metadata_sha256"] is None:
-            items.append(
-                build_item(
-                request=request,
-                    status="failed",
-                    image_id=image_id,
-                    original_name=r["original_name"],
-                    processed_at=r["processed_at"],
-                    error=r["err_msg"],
-                )
-            )
-            continue
-        exif_obj = None
-        exif = r["exif_json"]
-        if exif:
-            try:
-                exif_obj = json.loads(exif)
-            except json.JSONDecodeError:
-                exif_obj = {"_raw": exif}  
-        items.append(
-            build_item(
-                request=request,
-                status="success",
-                image_id=image_id,
-                original_name=r["original_name"],
-                processed_at=r["processed_at"],
-                metadata={
-                    "width": r["width"],
-                    "height": r["height"],
-                    "format": r["format"],
-                    "size_bytes": r["size_bytes"],
-                    "sha256": r["metadata_sha256"],
-                    "first_upload": r["first_upload"],
-                    "caption": r["caption"],
-                    "exif_json": exif_obj,
-                },
-            )
+def query_images(base: str, limit: int, offset: int, near: str | None = None) -> list[dict[str, Any]]:
+    where = ""
+    params: tuple[Any, ...] = (limit, offset)
+    if near is not None:
+        ref = fetch_one(
+            "SELECT i.metadata_sha256, m.phash FROM images i LEFT JOIN metadata m ON m.sha256 = i.metadata_sha256 WHERE i.image_id = ?",
+            (near,),
         )
-
-    return items
-
-@app.get("/api/images/{image_id}")
-def get_image(request: Request, image_id: str) -> dict[str, Any]:
-    with connect() as conn:
-        r = conn.execute(
-            """
-            SELECT
+        if not ref:
+            raise HTTPException(404, "Image not found")
+        if ref["metadata_sha256"] is None:
+            raise HTTPException(404, "Image has no metadata")
+        if ref["phash"] is None:
+            raise HTTPException(409, "Perceptual hash not computed yet")
+        # full scan by design: no index can answer a hamming distance predicate
+        where = "WHERE hamming(m.phash, ?) < ? AND i.image_id != ?"
+        params = (ref["phash"], NEAR_MAX_DISTANCE, near, limit, offset)
+
+    rows = fetch_all(
+        f"""
+        SELECT
             i.image_id,
             i.original_name,
             i.processed_at,
-            i.image_path,
             i.metadata_sha256,
-            i.error,
+            i.error AS err_msg,
             m.width,
             m.height,
             m.format,
             m.size_bytes,
             m.first_upload,
-            m.exif_json,
-            m.caption
-            FROM images i
-            LEFT JOIN metadata m ON m.sha256 = i.metadata_sha256
-            WHERE i.image_id = ?
-            """,
-            (image_id,),
-        ).fetchone()
-
-        if not r:
-            raise HTTPException(status_code=404, detail="Image not found")
-
-        exif_obj = None
-        exif = r["exif_json"]
-        if exif:
-            try:
-                exif_obj = json.loads(exif)
-            except json.JSONDecodeError:
-                exif_obj = {"_raw": exif}  
-        img_id = r["image_id"]
-        base = str(request.base_url).rstrip("/")
-        if r["metadata_sha256"] is None:
-            err_msg = r["error"] or "unknown error"
-            data = {
-                "image_id": r["image_id"],
-                "original_name": r["original_name"],
-                "processed_at": r["processed_at"],
-                "image_path": r["image_path"],
-                "metadata": {},
-                "thumbnails": {},
-            }
-            return {"status": "failed", "data": data, "error": err_msg}
-        
+            m.caption,
+            m.exif_json
+        FROM images i
+        LEFT JOIN metadata m ON m.sha256 = i.metadata_sha256
+        {where}
+        ORDER BY i.processed_at DESC
+        LIMIT ? OFFSET ?
+        """,
+        params,
+    )
+
+    items: list[dict[str, Any]] = []
+
+    # rows unpack positionally in SELECT order; literals avoid a build_item call per row
+    for (image_id, original_name, processed_at, sha256, err_msg,
+         width, height, fmt, size_bytes, first_upload, caption, exif) in rows:
+        if sha256 is None:
+            items.append({
+                "status": "failed",
+                "data": {
+                    "image_id": image_id,
+                    "original_name": original_name,
+                    "processed_at": processed_at,
+                    "metadata": {},
+                    "thumbnails": {},
+                },
+                "error": err_msg,
+            })
+            continue
+        items.append({
+            "status": "success",
+            "data": {
+                "image_id": image_id,
+                "original_name": original_name,
+                "processed_at": processed_at,
+                "metadata": {
+                    "width": width,
+                    "height": height,
+                    "format": fmt,
+                    "size_bytes": size_bytes,
+                    "sha256": sha256,
+                    "first_upload": first_upload,
+                    "caption": caption,
+                    # stored JSON is spliced into the response as-is, never decoded
+                    "exif_json": orjson.Fragment(exif) if exif else None,
+                },
+                "thumbnails": {
+                    "small": f"{base}/api/images/{image_id}/thumbnails/small",
+                    "medium": f"{base}/api/images/{image_id}/thumbnails/medium",
+                },
+            },
+            "error": None,
+        })
+
+    return items
+
+@app.get("/api/images")
+async def list_images(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    near: str | None = Query(None),
+) -> OrjsonResponse:
+    base = str(request.base_url).rstrip("/")
+    # rows are fetched and shaped in the worker thread; the event loop only serializes
+    return OrjsonResponse(await run_in_threadpool(query_images, base, limit, offset, near))
+
+def query_image(base: str, image_id: str) -> dict[str, Any]:
+    r = fetch_one(
+        """
+        SELECT
+        i.image_id,
+        i.original_name,
+        i.processed_at,
+        i.image_path,
+        i.metadata_sha256,
+        i.error,
+        m.width,
+        m.height,
+        m.format,
+        m.size_bytes,
+        m.first_upload,
+        m.exif_json,
+        m.caption
+        FROM images i
+        LEFT JOIN metadata m ON m.sha256 = i.metadata_sha256
+        WHERE i.image_id = ?
+        """,
+        (image_id,),
+    )
+
+    if not r:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    exif = r["exif_json"]
+    img_id = r["image_id"]
+    if r["metadata_sha256"] is None:
+        err_msg = r["error"] or "unknown error"
         data = {
             "image_id": r["image_id"],
             "original_name": r["original_name"],
             "processed_at": r["processed_at"],
             "image_path": r["image_path"],
-            "metadata": {
-                "width": r["width"],
-                "height": r["height"],
-                "format": r["format"],
-                "size_bytes": r["size_bytes"],
-                "first_upload": r["first_upload"],
-                "exif_json": exif_obj, 
-                "sha256": r["metadata_sha256"],
-                "caption": r["caption"]
-            },
-            "thumbnails": {
-                "small": f"{base}/api/images/{img_id}/thumbnails/small",
-                "medium": f"{base}/api/images/{img_id}/thumbnails/medium",
-            },
+            "metadata": {},
+            "thumbnails": {},
         }
+        return {"status": "failed", "data": data, "error": err_msg}
+    
+    data = {
+        "image_id": r["image_id"],
+        "original_name": r["original_name"],
+        "processed_at": r["processed_at"],
+        "image_path": r["image_path"],
+        "metadata": {
+            "width": r["width"],
+            "height": r["height"],
+            "format": r["format"],
+            "size_bytes": r["size_bytes"],
+            "first_upload": r["first_upload"],
+            "exif_json": orjson.Fragment(exif) if exif else None,
+            "sha256": r["metadata_sha256"],
+            "caption": r["caption"]
+        },
+        "thumbnails": {
+            "small": f"{base}/api/images/{img_id}/thumbnails/small",
+            "medium": f"{base}/api/images/{img_id}/thumbnails/medium",
+        },
+    }
 
     return {"status": "success", "data": data, "error": None}
 
+@app.get("/api/images/{image_id}")
+async def get_image(request: Request, image_id: str) -> OrjsonResponse:
+    base = str(request.base_url).rstrip("/")
+    return OrjsonResponse(await run_in_threadpool(query_image, base, image_id))
+
+@lru_cache(maxsize=1024)
+def lookup_sha256(image_id: str) -> str | None:
+    # image_id -> sha256 never changes once inserted; unknown ids raise and are not cached
+    row = fetch_one("SELECT metadata_sha256 FROM images WHERE image_id=?", (image_id,))
+    if not row:
+        raise HTTPException(404, "Image not found")
+    return row["metadata_sha256"]
+
 @app.get("/api/images/{image_id}/thumbnails/{size}")
-def get_thumbnail(image_id: str, size: str):
+async def get_thumbnail(image_id: str, size: str):
     if size not in {"small","medium"}:
         raise HTTPException(400, "Invalid thumbnail size")
     
-    with connect() as conn:
-        row = conn.execute(
-            "SELECT metadata_sha256 FROM images WHERE image_id=?",
-            (image_id,),
-        ).fetchone()
-        
-    if not row:
-        raise HTTPException(404, "Image not found")
-    
-    sha256 = row["metadata_sha256"]
+    sha256 = await run_in_threadpool(lookup_sha256, image_id)
     if sha256 is None:
         raise HTTPException(404, "No thumbnail for failed upload")
+
+    filename = f"{sha256}_{size}.jpeg"
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if THUMBS_ACCEL_PREFIX:
+        # nginx serves the bytes (sendfile) from its internal location
+        headers["X-Accel-Redirect"] = f"{THUMBS_ACCEL_PREFIX}/{size}/{sha256}.jpeg"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return Response(media_type="image/jpeg", headers=headers)
+
     thumb_path = MEDIA_DIR / "thumbnails" / size / f"{sha256}.jpeg"
-    
-    if not thumb_path.exists():
+    try:
+        # one stat, handed to FileResponse so it doesn't stat again
+        stat_result = os.stat(thumb_path)
+    except FileNotFoundError:
         raise HTTPException(404, "Thumbnail not generated yet")
 
     return FileResponse(
         path=str(thumb_path),
         media_type="image/jpeg",
-        filename=f"{sha256}_{size}.jpeg",
-        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+        filename=filename,
+        headers=headers,
+        stat_result=stat_result,
     )
 
 @app.get("/api/stats")
-def get_stats() -> dict[str, Any]:
-    fmt = "%Y-%m-%d %H:%M:%S"
-
-    with connect() as conn:
-        rows = conn.execute("SELECT start_time, end_time, status FROM stats").fetchall()
-
-    total = len(rows)
-    failed = sum(1 for r in rows if r["status"] == 0)
-
-    durations = [
-        (datetime.strptime(r["end_time"], fmt) - datetime.strptime(r["start_time"], fmt)).total_seconds()
-        for r in rows
-        if r["end_time"] is not None
-    ]
-    avg_seconds = int(round(sum(durations) / len(durations))) if durations else 0
+async def get_stats() -> dict[str, Any]:
+    r = await run_in_threadpool(
+        fetch_one,
+        """
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(status = 0), 0) AS failed,
+            COALESCE(SUM(status = 1), 0) AS ok,
+            AVG((julianday(end_time) - julianday(start_time)) * 86400) AS avg_s
+        FROM stats
+        """,
+    )
 
-    completed = [r for r in rows]
-    completed_total = len(completed)
-    completed_success = sum(1 for r in completed if r["status"] == 1)
-    success_rate = f"{(completed_success / completed_total) * 100:.2f}%" if completed_total else "0.00%"
+    total = r["total"]
+    avg_seconds = int(round(r["avg_s"])) if r["avg_s"] is not None else 0
+    success_rate = f"{(r['ok'] / total) * 100:.2f}%" if total else "0.00%"
 
     return {
         "total": total,
-        "failed": failed,
+        "failed": r["failed"],
         "success_rate": success_rate,
         "average_processing_time_seconds": avg_seconds,
     }
\ No newline at end of file
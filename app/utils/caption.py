@@ -7,32 +7,62 @@ from transformers import BlipProcessor, BlipForConditionalGeneration
 
 
 
+MODEL_ID = "Salesforce/blip-image-captioning-base"  # faster/lighter than large
+
 _MODEL = None
 _PROCESSOR = None
+def _cpu_has_native_bf16() -> bool:
+    # without AVX512-BF16/AMX, oneDNN emulates bf16 matmuls and runs slower than fp32
+    if not torch.backends.mkldnn.is_available():
+        return False
+    checks = ("_is_avx512_bf16_supported", "_is_amx_tile_supported")
+    return any(getattr(torch.cpu, name, lambda: False)() for name in checks)
+
+_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+if _DEVICE == "cuda":
+    _DTYPE = torch.float16
+elif _cpu_has_native_bf16():
+    _DTYPE = torch.bfloat16
+else:
+    _DTYPE = torch.float32
 
 def get_blip():
     global _MODEL, _PROCESSOR
     if _MODEL is None or _PROCESSOR is None:
-        model_id = "Salesforce/blip-image-captioning-base"  # faster/lighter than large
-        _PROCESSOR = BlipProcessor.from_pretrained(model_id)
-        _MODEL = BlipForConditionalGeneration.from_pretrained(model_id,output_loading_info=False,).eval()
+        _PROCESSOR = BlipProcessor.from_pretrained(MODEL_ID)
+        _MODEL = BlipForConditionalGeneration.from_pretrained(MODEL_ID,output_loading_info=False,).eval()
+        _MODEL = _MODEL.to(_DEVICE, dtype=_DTYPE)
+        # generate() bypasses the top-level forward, so compile the submodules it calls;
+        # opt-in because inductor needs a C compiler, which the slim image lacks
+        if os.getenv("BLIP_COMPILE") == "1":
+            mode = "reduce-overhead" if _DEVICE == "cuda" else "default"
+            _MODEL.vision_model.compile(mode=mode)
+            _MODEL.text_decoder.compile(mode=mode, dynamic=True)
     return _MODEL, _PROCESSOR
 
-def extractCaption(image_path: Path) -> str:
-    model, processor = get_blip()
-
+def loadCaptionImage(image_path: Path) -> Image.Image:
     with Image.open(image_path) as im:
         im = im.convert("RGB")
-
         im.thumbnail((1024, 1024))
+        return im
 
-        inputs = processor(images=im, return_tensors="pt")
+def captionImages(images: list[Image.Image]) -> list[str]:
+    model, processor = get_blip()
+
+    inputs = processor(images=images, return_tensors="pt").to(_DEVICE, _DTYPE)
 
+    # fp32 fallback runs without autocast
+    with torch.inference_mode(), torch.autocast(device_type=_DEVICE, dtype=_DTYPE, enabled=_DTYPE != torch.float32):
         out_ids = model.generate(
             **inputs,
             max_new_tokens=30, 
             num_beams=1, 
         )
 
-        caption = processor.decode(out_ids[0], skip_special_tokens=True).strip()
-        return caption
\ No newline at end of file
+    return [c.strip() for c in processor.batch_decode(out_ids, skip_special_tokens=True)]
+
+def extractCaptions(image_paths: list[Path]) -> list[str]:
+    return captionImages([loadCaptionImage(image_path) for image_path in image_paths])
+
+def extractCaption(image_path: Path) -> str:
+    return extractCaptions([image_path])[0]
\ No newline at end of file
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+IMG_SIZE = 32
+
+# unnormalized DCT-II basis (same scaling as scipy.fftpack.dct), so D @ X @ D.T is the 2-D DCT
+_n = np.arange(IMG_SIZE)
+_DCT = 2 * np.cos(np.pi * np.outer(_n, 2 * _n + 1) / (2 * IMG_SIZE))
+
+def computePhash(image_path: Path) -> int:
+    with Image.open(image_path) as im:
+        im.draft("L", (IMG_SIZE * 4, IMG_SIZE * 4))
+        pixels = np.asarray(im.convert("L").resize((IMG_SIZE, IMG_SIZE), Image.Resampling.LANCZOS), dtype=np.float64)
+
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low > np.median(low)).flatten()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    # SQLite INTEGER is signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def hamming(a: int | None, b: int | None) -> int | None:
+    if a is None or b is None:
+        return None
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
\ No newline at end of file
@@ -1,27 +1,84 @@
+import shutil
 from pathlib import Path
 from PIL import Image
 
-THUMBS_DIR = Path("media") / "thumbnails"
+try:
+    import pyvips
+except (ImportError, OSError):  # pyvips missing or libvips not installed
+    pyvips = None
 
-def generateThumbnail(image_path: Path, sha256: str) -> dict[str, str]:
-    small_path = THUMBS_DIR / "small" / f"{sha256}.jpeg"
-    medium_path = THUMBS_DIR / "medium" / f"{sha256}.jpeg"
+THUMBS_DIR = Path("media") / "thumbnails"
+SIZES = {"medium": 768, "small": 256}
 
-    small_path.parent.mkdir(parents=True, exist_ok=True)
-    medium_path.parent.mkdir(parents=True, exist_ok=True)
+def _vips_thumbnail(image_path: Path, size: int, dest: Path) -> None:
+    # shrink-on-load + sequential access keeps memory at O(scanline)
+    im = pyvips.Image.thumbnail(str(image_path), size, height=size, size="down")
+    if im.hasalpha():
+        im = im.flatten()
+    if im.interpretation != "srgb":
+        im = im.colourspace("srgb")
+    # strip is deprecated since libvips 8.15 in favour of keep
+    meta = {"keep": "none"} if pyvips.at_least_libvips(8, 15) else {"strip": True}
+    im.jpegsave(str(dest), Q=82, optimize_coding=True, **meta)
 
+def _pil_thumbnails(image_path: Path, targets: list[tuple[int, Path]]) -> None:
+    targets = sorted(targets, reverse=True)
     with Image.open(image_path) as im:
+        # let libjpeg decode at 1/2, 1/4 or 1/8 scale when the source is much larger
+        im.draft("RGB", (targets[0][0] * 2, targets[0][0] * 2))
         im = im.convert("RGB")
 
-        small = im.copy()
-        small.thumbnail((256, 256))
-        small.save(small_path, format="JPEG", quality=85, optimize=True)
+        # one decode: shrink to the largest size, then derive each smaller one from the last result
+        for i, (size, path) in enumerate(targets):
+            resample = Image.Resampling.BILINEAR if i == 0 else Image.Resampling.BICUBIC
+            im.thumbnail((size, size), resample, reducing_gap=2.0)
+            im.save(path, format="JPEG", quality=82, optimize=False, progressive=False)
+
+def _render(image_path: Path, targets: list[tuple[int, Path]]) -> None:
+    if pyvips is not None:
+        for size, path in targets:
+            _vips_thumbnail(image_path, size, path)
+    else:
+        _pil_thumbnails(image_path, targets)
+
+def _copyable_jpeg(im: Image.Image) -> bool:
+    # thumbnails are served publicly and cached immutably: only a baseline YCbCr JPEG with
+    # no EXIF/XMP (APP1) or IPTC (APP13) segment can be published byte-for-byte
+    return (
+        im.format == "JPEG"
+        and im.mode == "RGB"
+        and im.info.get("adobe_transform") != 0
+        and not im.info.get("progressive")
+        and not any(marker in ("APP1", "APP13") for marker, _ in im.applist)
+    )
+
+def generateThumbnail(image_path: Path, sha256: str) -> dict[str, str]:
+    paths = {name: THUMBS_DIR / name / f"{sha256}.jpeg" for name in SIZES}
+    for path in paths.values():
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    # header only: no pixels are decoded here
+    with Image.open(image_path) as im:
+        copyable, longest = _copyable_jpeg(im), max(im.size)
+
+    todo = []
+    for name, size in SIZES.items():
+        if copyable and longest <= size:
+            # already a JPEG within bounds: resizing is a no-op, so skip the decode/encode
+            shutil.copyfile(image_path, paths[name])
+        else:
+            todo.append((size, paths[name]))
 
-        medium = im.copy()
-        medium.thumbnail((768, 768))
-        medium.save(medium_path, format="JPEG", quality=85, optimize=True)
+    if todo and longest <= min(size for size, _ in todo):
+        # unscaled at every remaining size: encode once and copy
+        first, *rest = todo
+        _render(image_path, [first])
+        for _, path in rest:
+            shutil.copyfile(first[1], path)
+    elif todo:
+        _render(image_path, todo)
 
     return {
-        "small": str(small_path),
-        "medium": str(medium_path),
+        "small": str(paths["small"]),
+        "medium": str(paths["medium"]),
     }
\ No newline at end of file
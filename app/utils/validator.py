@@ -2,11 +2,11 @@ from pathlib import Path
 from dataclasses import dataclass
 from fastapi import HTTPException, UploadFile
 
-from io import BytesIO
 from PIL import Image, UnidentifiedImageError
 
 
 import hashlib
+import os
 
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
 ALLOWED_MIME = {"image/jpeg", "image/png"}
@@ -14,6 +14,11 @@ SIGNATURES = {
     "image/jpeg": [b"\xFF\xD8\xFF"],
     "image/png": [b"\x89PNG\r\n\x1a\n"]
 }
+SIGNATURE_LEN = max(len(sig) for sigs in SIGNATURES.values() for sig in sigs)
+CHUNK_SIZE = 64 * 1024
+MAX_BYTES = 100 * 1024 * 1024 #100mb
+MAX_PIXELS = 50_000_000
+STRICT_VALIDATION = os.getenv("STRICT_VALIDATION", "0") == "1"
 
 def get_ext(filename: str) -> str:
     return Path(filename or "").suffix.lower()
@@ -21,14 +26,15 @@ def get_ext(filename: str) -> str:
 def match_signature(mime: str, data:bytes) -> bool:
     return any(data.startswith(signature) for signature in SIGNATURES.get(mime, []))
 
-def pil_validate(data: bytes, *, max_pixels: int=50_000_000) -> tuple[int,int,str]:
+def pil_validate(path: Path, *, max_pixels: int=MAX_PIXELS, verify: bool=True) -> tuple[int,int,str]:
     try:
-        img = Image.open(BytesIO(data))
-        w, h = img.size
-        if w * h > max_pixels:
-            return (0,0,"")
-        img.verify()
-        return (w, h, img.format.lower())
+        with Image.open(path) as img:
+            w, h = img.size
+            if w * h > max_pixels:
+                return (0,0,"")
+            if verify:
+                img.verify()
+            return (w, h, img.format.lower())
     except HTTPException:
         raise
     except (UnidentifiedImageError, OSError):
@@ -38,14 +44,52 @@ def pil_validate(data: bytes, *, max_pixels: int=50_000_000) -> tuple[int,int,st
 class ValidatedUpload:
     ext: str
     mime: str
-    bytes: bytes
+    size: int
     sha256: str
     width: int
     height: int
     format: str
     
+async def stream_to_disk(
+    file: UploadFile,
+    destination: Path,
+    mime: str,
+    *,
+    max_bytes: int = MAX_BYTES,
+) -> tuple[str, int]:
+    # content hash for dedup, not a security boundary; hashlib's OpenSSL backend uses SHA-NI where present
+    hasher = hashlib.sha256(usedforsecurity=False)
+    prefix = b""
+    size = 0
+    fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            if len(prefix) < SIGNATURE_LEN:
+                prefix += chunk[:SIGNATURE_LEN - len(prefix)]
+                if len(prefix) >= SIGNATURE_LEN and not match_signature(mime, prefix):
+                    raise HTTPException(400,"File bytes do not match image type")
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(400, "File too large")
+            hasher.update(chunk)
+            os.write(fd, chunk)
+        if not size:
+            raise HTTPException(400, "Empty upload")
+        if not match_signature(mime, prefix):
+            raise HTTPException(400,"File bytes do not match image type")
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    finally:
+        os.close(fd)
+    return hasher.hexdigest(), size
+
 async def validate(
     file: UploadFile,
+    destination: Path,
+    *,
+    max_bytes: int = MAX_BYTES,
+    strict: bool = STRICT_VALIDATION,
 ) -> ValidatedUpload:
     extension = get_ext(file.filename or "")
     if extension not in ALLOWED_EXTENSIONS:
@@ -55,18 +99,19 @@ async def validate(
     if mime not in ALLOWED_MIME:
         raise HTTPException(400, f"Bad MIME type: {mime or '(none)'}")
     
-    data = await file.read()
-    if not data:
-        raise HTTPException(400, "Empty upload")
-    if not match_signature(mime, data):
-        raise HTTPException(400,"File bytes do not match image type")
-    width, height, format = pil_validate(data, max_pixels=50_000_000)
+    sha256, size = await stream_to_disk(file, destination, mime, max_bytes=max_bytes)
+    try:
+        # Image.open only parses the header; the full-file verify() pass is opt-in
+        width, height, format = pil_validate(destination, max_pixels=MAX_PIXELS, verify=strict)
+    except HTTPException:
+        destination.unlink(missing_ok=True)
+        raise
     
     return ValidatedUpload(
         ext= extension,
         mime= mime,
-        bytes=data,
-        sha256=hashlib.sha256(data).hexdigest(),
+        size=size,
+        sha256=sha256,
         width=width,
         height=height,
         format=format)
\ No newline at end of file
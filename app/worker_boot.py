@@ -1,7 +1,7 @@
 import os
 import logging
 import subprocess
-from huggingface_hub import login
+from huggingface_hub import login, snapshot_download
 from transformers.utils import logging as tlog
 
 tlog.set_verbosity_error()
@@ -15,15 +15,40 @@ logging.getLogger("torch").setLevel(logging.ERROR)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
 
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", str(min(os.cpu_count() or 1, 4))))
+THREADS_PER_WORKER = int(os.getenv("THREADS_PER_WORKER", "2"))
+
 def warmup_model():
-    from app.utils.caption import get_blip
-    logger.info("Warming up BLIP...")
-    get_blip()
-    logger.info("BLIP warmed.")
+    from app.utils.caption import MODEL_ID
+    # fetch the weights into the HF cache only: each pool worker loads its own copy on
+    # its first job, so loading one here would just hold an extra model in this idle parent
+    logger.info("Downloading BLIP...")
+    snapshot_download(MODEL_ID)
+    logger.info("BLIP cached.")
+
+def worker_pool_command(redis_url: str) -> list[str]:
+    # SimpleWorker runs jobs in the worker process itself; the default Worker forks a
+    # work-horse per job, which would reload BLIP (and redo the dtype cast/compile) every time
+    return [
+        "rq", "worker-pool", "image-jobs",
+        "--url", redis_url,
+        "-n", str(WORKER_COUNT),
+        "-w", "rq.worker.SimpleWorker",
+    ]
 
 if __name__ == "__main__":
-    warmup_model()
     login(token = (os.getenv("HF_TOKEN") or os.getenv("HUGGINGFACE_HUB_TOKEN") or "").strip() or None)
+    warmup_model()
     redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
-    logger.info("Starting RQ worker...")
-    subprocess.run(["rq", "worker", "image-jobs", "--url", redis_url], check=True)
\ No newline at end of file
+    # pin BLIP/OpenMP threads so N workers don't oversubscribe the CPU
+    env = {
+        **os.environ,
+        "OMP_NUM_THREADS": str(THREADS_PER_WORKER),
+        "MKL_NUM_THREADS": str(THREADS_PER_WORKER),
+    }
+    logger.info("Starting RQ worker pool (%s workers)...", WORKER_COUNT)
+    subprocess.run(
+        worker_pool_command(redis_url),
+        env=env,
+        check=True,
+    )
\ No newline at end of file
@@ -9,6 +9,9 @@ class DummyQueue:
     def enqueue(self, *args, **kwargs):
         return None
 
+    def enqueue_many(self, job_datas, *args, **kwargs):
+        return []
+
 
 @pytest.fixture()
 def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
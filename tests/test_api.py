@@ -72,4 +72,138 @@ def test_get_stats(client):
     assert j["total"] >= 2
     assert j["failed"] >= 1
     assert "success_rate" in j
-    assert "average_processing_time_seconds" in j
\ No newline at end of file
+    assert "average_processing_time_seconds" in j
+
+def test_get_images_list_paginates(client):
+    data = make_png_bytes()
+    client.post("/api/images", files={"file": ("a.png", data, "image/png")})
+    client.post("/api/images", files={"file": ("b.png", data, "image/png")})
+
+    res = client.get("/api/images", params={"limit": 1})
+    assert res.status_code == 200
+    assert len(res.json()) == 1
+
+    res = client.get("/api/images", params={"limit": 0})
+    assert res.status_code == 422
+
+
+def test_post_image_enqueues_one_job(client, monkeypatch):
+    import app.main as main
+
+    class RecordingQueue:
+        def __init__(self):
+            self.calls = []
+
+        @property
+        def count(self):
+            raise AssertionError("upload must not query the queue length")
+
+        def enqueue_many(self, job_datas, *args, **kwargs):
+            self.calls.append([jd.func for jd in job_datas])
+
+    q = RecordingQueue()
+    monkeypatch.setattr(main, "get_queue", lambda: q)
+
+    data = make_png_bytes(11, 13)
+    client.post("/api/images", files={"file": ("busy.png", data, "image/png")})
+    assert q.calls == [[main.process_image_job]]
+
+
+def test_get_thumbnail(client):
+    import app.main as main
+
+    data = make_png_bytes(17, 9)
+    up = client.post("/api/images", files={"file": ("t.png", data, "image/png")}).json()
+    image_id = up["data"]["image_id"]
+    sha256 = up["data"]["metadata"]["sha256"]
+
+    res = client.get(f"/api/images/{image_id}/thumbnails/small")
+    assert res.status_code == 404
+
+    thumb = main.MEDIA_DIR / "thumbnails" / "small" / f"{sha256}.jpeg"
+    thumb.parent.mkdir(parents=True, exist_ok=True)
+    thumb.write_bytes(b"\xFF\xD8\xFFjpeg")
+
+    res = client.get(f"/api/images/{image_id}/thumbnails/small")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "image/jpeg"
+    assert res.content == b"\xFF\xD8\xFFjpeg"
+
+    assert client.get("/api/images/missing/thumbnails/small").status_code == 404
+
+
+def test_duplicate_upload_shares_stored_file(client):
+    from pathlib import Path
+
+    data = make_png_bytes(23, 5)
+    first = client.post("/api/images", files={"file": ("d1.png", data, "image/png")}).json()
+    second = client.post("/api/images", files={"file": ("d2.png", data, "image/png")}).json()
+    assert second["status"] == "success"
+    assert first["data"]["metadata"]["sha256"] == second["data"]["metadata"]["sha256"]
+
+    p1 = Path(client.get(f"/api/images/{first['data']['image_id']}").json()["data"]["image_path"])
+    p2 = Path(client.get(f"/api/images/{second['data']['image_id']}").json()["data"]["image_path"])
+    assert p1 != p2
+    assert p2.read_bytes() == data
+    assert p1.stat().st_ino == p2.stat().st_ino
+
+
+def test_exif_json_is_returned_verbatim(client):
+    import app.main as main
+
+    data = make_png_bytes(31, 3)
+    up = client.post("/api/images", files={"file": ("e.png", data, "image/png")}).json()
+    with main.get_conn() as conn:
+        conn.execute(
+            "UPDATE metadata SET exif_json = ? WHERE sha256 = ?",
+            ('{"Image Make":"FUJIFILM"}', up["data"]["metadata"]["sha256"]),
+        )
+
+    j = client.get(f"/api/images/{up['data']['image_id']}").json()
+    assert j["data"]["metadata"]["exif_json"] == {"Image Make": "FUJIFILM"}
+
+    items = client.get("/api/images", params={"limit": 1000}).json()
+    match = [i for i in items if i["data"]["image_id"] == up["data"]["image_id"]]
+    assert match[0]["data"]["metadata"]["exif_json"] == {"Image Make": "FUJIFILM"}
+
+
+def test_get_images_near_duplicates(client):
+    import app.main as main
+
+    ids = []
+    for i, (w, h) in enumerate([(40, 41), (42, 43), (44, 45)]):
+        up = client.post("/api/images", files={"file": (f"n{i}.png", make_png_bytes(w, h), "image/png")}).json()
+        ids.append(up["data"])
+
+    with main.get_conn() as conn:
+        for data, phash in zip(ids, [0b1011, 0b1001, -1]):
+            conn.execute("UPDATE metadata SET phash = ? WHERE sha256 = ?", (phash, data["metadata"]["sha256"]))
+
+    res = client.get("/api/images", params={"near": ids[0]["image_id"]})
+    assert res.status_code == 200
+    near_ids = {item["data"]["image_id"] for item in res.json()}
+    assert ids[1]["image_id"] in near_ids
+    assert ids[0]["image_id"] not in near_ids
+    assert ids[2]["image_id"] not in near_ids
+
+    assert client.get("/api/images", params={"near": "missing"}).status_code == 404
+
+    failed = client.post("/api/images", files={"file": ("bad.png", b"junk", "image/png")}).json()
+    res = client.get("/api/images", params={"near": failed["data"]["image_id"]})
+    assert res.status_code == 404
+    assert res.json()["detail"] == "Image has no metadata"
+
+    pending = client.post("/api/images", files={"file": ("p.png", make_png_bytes(46, 47), "image/png")}).json()
+    assert client.get("/api/images", params={"near": pending["data"]["image_id"]}).status_code == 409
+
+
+def test_list_images_base_url_with_braces(client):
+    import app.main as main
+
+    up = client.post("/api/images", files={"file": ("b.png", make_png_bytes(5, 6), "image/png")}).json()
+    image_id = up["data"]["image_id"]
+
+    for base in ("http://evil{x}", "http://evil{0.__class__}"):
+        items = main.query_images(base, 1000, 0)
+        item = next(i for i in items if i["data"]["image_id"] == image_id)
+        assert item["data"]["thumbnails"]["small"] == f"{base}/api/images/{image_id}/thumbnails/small"
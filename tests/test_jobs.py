@@ -0,0 +1,220 @@
+import sqlite3
+import uuid
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+
+def make_png_bytes(w=10, h=10) -> bytes:
+    buf = BytesIO()
+    Image.new("RGB", (w, h)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def insert_image(main, tmp_path, data: bytes) -> str:
+    sha256 = uuid.uuid4().hex
+    image_id = uuid.uuid4().hex
+    path = tmp_path / f"{image_id}.png"
+    path.write_bytes(data)
+    with sqlite3.connect(main.DB_PATH) as conn:
+        conn.execute("INSERT INTO metadata (sha256) VALUES (?)", (sha256,))
+        conn.execute(
+            "INSERT INTO images (image_id, original_name, metadata_sha256, image_path) VALUES (?, ?, ?, ?)",
+            (image_id, path.name, sha256, str(path)),
+        )
+        conn.execute("INSERT INTO stats (image_id, status) VALUES (?, 1)", (image_id,))
+    return sha256
+
+
+def caption_row(main, sha256):
+    with sqlite3.connect(main.DB_PATH) as conn:
+        return conn.execute(
+            "SELECT caption, caption_error FROM metadata WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+
+
+def test_caption_batch_job_skips_unreadable_images(client, tmp_path, monkeypatch):
+    import app.jobs as jobs
+    import app.main as main
+
+    monkeypatch.setattr(jobs, "DB_PATH", main.DB_PATH)
+    batches = []
+    monkeypatch.setattr(jobs, "captionImages", lambda images: batches.append(len(images)) or ["a cat"] * len(images))
+    # leave rows from other tests out of the batch
+    with sqlite3.connect(main.DB_PATH) as conn:
+        conn.execute("UPDATE metadata SET caption_error = 'other test' WHERE caption IS NULL")
+
+    good = insert_image(main, tmp_path, make_png_bytes())
+    bad = insert_image(main, tmp_path, b"\x89PNG\r\n\x1a\n" + b"\x00" * 64)
+
+    assert jobs.caption_batch_job() == 1
+    assert batches == [1]
+    assert caption_row(main, good) == ("a cat", None)
+    caption, error = caption_row(main, bad)
+    assert caption is None and error
+
+    # the failed image is not picked up again
+    assert jobs.caption_batch_job() == 0
+    assert batches == [1]
+
+
+def test_caption_batch_job_leaves_claimed_rows(client, tmp_path, monkeypatch):
+    import app.jobs as jobs
+    import app.main as main
+
+    monkeypatch.setattr(jobs, "DB_PATH", main.DB_PATH)
+    monkeypatch.setattr(jobs, "captionImages", lambda images: ["a dog"] * len(images))
+    with sqlite3.connect(main.DB_PATH) as conn:
+        conn.execute("UPDATE metadata SET caption_error = 'other test' WHERE caption IS NULL")
+
+    sha256 = insert_image(main, tmp_path, make_png_bytes())
+    assert jobs._claim_caption(sha256)
+    assert not jobs._claim_caption(sha256)
+
+    assert jobs.caption_batch_job() == 0
+    assert caption_row(main, sha256) == (None, None)
+
+
+def test_caption_deferred_to_batch_under_backlog(monkeypatch):
+    import app.jobs as jobs
+
+    class BusyQueue:
+        count = jobs.CAPTION_BATCH_THRESHOLD
+        enqueued = []
+
+        def __init__(self, name, connection=None):
+            pass
+
+        def fetch_job(self, job_id):
+            return None
+
+        def enqueue(self, func, *args, job_id=None, **kwargs):
+            self.enqueued.append((func, job_id))
+
+    class FakeJob:
+        origin = "image-jobs"
+        connection = None
+
+    monkeypatch.setattr(jobs, "Queue", BusyQueue)
+    monkeypatch.setattr(jobs, "get_current_job", lambda: FakeJob())
+    assert jobs._defer_to_caption_batch()
+    assert BusyQueue.enqueued == [(jobs.caption_batch_job, jobs.CAPTION_BATCH_JOB_ID)]
+
+    BusyQueue.count = 0
+    assert not jobs._defer_to_caption_batch()
+    assert len(BusyQueue.enqueued) == 1
+
+
+def test_process_image_job_keeps_exif_and_phash_when_caption_fails(client, tmp_path, monkeypatch):
+    import app.jobs as jobs
+    import app.main as main
+    import app.utils.thumbnail as thumbnail
+
+    monkeypatch.setattr(jobs, "DB_PATH", main.DB_PATH)
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+    sha256 = insert_image(main, tmp_path, make_png_bytes(40, 30))
+    with sqlite3.connect(main.DB_PATH) as conn:
+        image_path, image_id = conn.execute(
+            "SELECT image_path, image_id FROM images WHERE metadata_sha256 = ?", (sha256,)
+        ).fetchone()
+
+    def broken_caption(path):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(jobs, "extractCaption", broken_caption)
+    jobs.process_image_job(sha256, image_path, image_id)
+
+    with sqlite3.connect(main.DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT exif_json, phash, caption, caption_claimed_at, caption_error FROM metadata WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+    exif_json, phash, caption, claimed_at, error = row
+    assert exif_json is not None and phash is not None
+    assert (caption, claimed_at, error) == (None, None, None)
+
+    # the batch job picks the image up again
+    monkeypatch.setattr(jobs, "captionImages", lambda images: ["a red square"] * len(images))
+    with sqlite3.connect(main.DB_PATH) as conn:
+        conn.execute("UPDATE metadata SET caption_error = 'other test' WHERE caption IS NULL AND sha256 != ?", (sha256,))
+    assert jobs.caption_batch_job() == 1
+    assert caption_row(main, sha256) == ("a red square", None)
+
+
+def test_process_image_job_saves_caption(client, tmp_path, monkeypatch):
+    import app.jobs as jobs
+    import app.main as main
+    import app.utils.thumbnail as thumbnail
+
+    monkeypatch.setattr(jobs, "DB_PATH", main.DB_PATH)
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+    monkeypatch.setattr(jobs, "extractCaption", lambda path: "a black square")
+    sha256 = insert_image(main, tmp_path, make_png_bytes(40, 30))
+    with sqlite3.connect(main.DB_PATH) as conn:
+        image_path, image_id = conn.execute(
+            "SELECT image_path, image_id FROM images WHERE metadata_sha256 = ?", (sha256,)
+        ).fetchone()
+
+    jobs.process_image_job(sha256, image_path, image_id)
+    assert caption_row(main, sha256) == ("a black square", None)
+
+
+def test_legacy_caption_job_respects_claim(client, tmp_path, monkeypatch):
+    import app.jobs as jobs
+    import app.main as main
+    import app.utils.thumbnail as thumbnail
+
+    monkeypatch.setattr(jobs, "DB_PATH", main.DB_PATH)
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+
+    def unexpected_caption(path):
+        raise AssertionError("claimed row must not be captioned twice")
+
+    monkeypatch.setattr(jobs, "extractCaption", unexpected_caption)
+    sha256 = insert_image(main, tmp_path, make_png_bytes(40, 30))
+    with sqlite3.connect(main.DB_PATH) as conn:
+        image_path, image_id = conn.execute(
+            "SELECT image_path, image_id FROM images WHERE metadata_sha256 = ?", (sha256,)
+        ).fetchone()
+    assert jobs._claim_caption(sha256)
+
+    jobs.caption_job(sha256, image_path, image_id)
+    assert caption_row(main, sha256) == (None, None)
+
+
+def test_process_image_job_keeps_exif_when_thumbnails_fail(client, tmp_path, monkeypatch):
+    import app.jobs as jobs
+    import app.main as main
+
+    monkeypatch.setattr(jobs, "DB_PATH", main.DB_PATH)
+
+    def truncated(path, sha256):
+        raise OSError("image file is truncated")
+
+    monkeypatch.setattr(jobs, "generateThumbnail", truncated)
+    captioned = []
+    monkeypatch.setattr(jobs, "extractCaption", lambda path: captioned.append(path) or "a grey square")
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"
+    buf = BytesIO()
+    Image.new("RGB", (40, 30)).save(buf, format="JPEG", exif=exif.tobytes())
+    sha256 = insert_image(main, tmp_path, buf.getvalue())
+    with sqlite3.connect(main.DB_PATH) as conn:
+        image_path, image_id = conn.execute(
+            "SELECT image_path, image_id FROM images WHERE metadata_sha256 = ?", (sha256,)
+        ).fetchone()
+
+    jobs.process_image_job(sha256, image_path, image_id)
+
+    with sqlite3.connect(main.DB_PATH) as conn:
+        exif_json, phash, caption = conn.execute(
+            "SELECT exif_json, phash, caption FROM metadata WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        (end_time,) = conn.execute("SELECT end_time FROM stats WHERE image_id = ?", (image_id,)).fetchone()
+    assert "Camera" in exif_json
+    assert phash is None
+    # captioning falls back to the original
+    assert captioned == [Path(image_path)]
+    assert caption == "a grey square"
+    assert end_time is not None
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from app.utils.phash import computePhash, hamming
+
+
+def make_pattern(path: Path, size: tuple[int, int], invert: bool = False) -> Path:
+    im = Image.new("L", size, 255 if invert else 0)
+    draw = ImageDraw.Draw(im)
+    w, h = size
+    draw.rectangle((w // 4, h // 4, w // 2, h), fill=0 if invert else 255)
+    draw.ellipse((w // 2, 0, w, h // 2), fill=128)
+    im.convert("RGB").save(path)
+    return path
+
+
+def test_phash_fits_signed_64_bit(tmp_path):
+    h = computePhash(make_pattern(tmp_path / "a.png", (120, 80)))
+    assert -(1 << 63) <= h < (1 << 63)
+
+
+def test_phash_resized_copy_is_near(tmp_path):
+    a = computePhash(make_pattern(tmp_path / "a.png", (400, 300)))
+    b = computePhash(make_pattern(tmp_path / "b.jpg", (200, 150)))
+    assert hamming(a, b) < 8
+
+
+def test_phash_different_image_is_far(tmp_path):
+    a = computePhash(make_pattern(tmp_path / "a.png", (400, 300)))
+    b = computePhash(make_pattern(tmp_path / "b.png", (400, 300), invert=True))
+    assert hamming(a, b) >= 8
+
+
+def test_hamming_handles_null_and_sign():
+    assert hamming(None, 1) is None
+    assert hamming(-1, 0) == 64
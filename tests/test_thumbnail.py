@@ -0,0 +1,62 @@
+from PIL import Image
+
+import app.utils.thumbnail as thumbnail
+
+
+def make_jpg(path, w, h, **save_kwargs):
+    Image.new("RGB", (w, h), (200, 40, 40)).save(path, format="JPEG", **save_kwargs)
+    return path
+
+
+def gps_exif() -> bytes:
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"
+    exif.get_ifd(0x8825)[2] = (52.0, 31.0, 12.0)  # GPSLatitude
+    return exif.tobytes()
+
+
+def test_plain_small_jpeg_is_copied(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+    src = make_jpg(tmp_path / "src.jpg", 120, 80)
+
+    paths = thumbnail.generateThumbnail(src, "copy")
+    for path in paths.values():
+        assert open(path, "rb").read() == src.read_bytes()
+
+
+def test_small_jpeg_with_exif_is_encoded_once_without_metadata(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+    src = make_jpg(tmp_path / "src.jpg", 120, 80, exif=gps_exif())
+
+    paths = thumbnail.generateThumbnail(src, "exif")
+    small, medium = (open(paths[name], "rb").read() for name in ("small", "medium"))
+    assert small == medium
+    assert small != src.read_bytes()
+    with Image.open(paths["small"]) as im:
+        assert im.size == (120, 80)
+        assert "APP1" not in [marker for marker, _ in im.applist]
+
+
+def test_small_progressive_or_cmyk_jpeg_is_reencoded(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+    progressive = make_jpg(tmp_path / "p.jpg", 60, 40, progressive=True)
+    cmyk = tmp_path / "c.jpg"
+    Image.new("CMYK", (60, 40)).save(cmyk, format="JPEG")
+
+    for src, sha256 in ((progressive, "prog"), (cmyk, "cmyk")):
+        paths = thumbnail.generateThumbnail(src, sha256)
+        with Image.open(paths["small"]) as im:
+            assert im.mode == "RGB"
+            assert not im.info.get("progressive")
+
+
+def test_large_image_is_rendered_per_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnail, "THUMBS_DIR", tmp_path / "thumbs")
+    src = make_jpg(tmp_path / "src.jpg", 1600, 900, exif=gps_exif())
+
+    paths = thumbnail.generateThumbnail(src, "big")
+    with Image.open(paths["medium"]) as im:
+        assert max(im.size) == thumbnail.SIZES["medium"]
+        assert "APP1" not in [marker for marker, _ in im.applist]
+    with Image.open(paths["small"]) as im:
+        assert max(im.size) == thumbnail.SIZES["small"]
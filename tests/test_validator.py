@@ -1,3 +1,4 @@
+import hashlib
 import pytest
 from io import BytesIO
 
@@ -40,45 +41,73 @@ def test_match_signature_png():
     assert match_signature("image/jpeg", data) is False
 
 
-def test_pil_validate_ok():
-    data = make_png_bytes(12, 7)
-    w, h, fmt = pil_validate(data, max_pixels=50_000_000)
+def test_pil_validate_ok(tmp_path):
+    path = tmp_path / "ok.png"
+    path.write_bytes(make_png_bytes(12, 7))
+    w, h, fmt = pil_validate(path, max_pixels=50_000_000)
     assert (w, h) == (12, 7)
     assert fmt == "png"
 
 
-def test_pil_validate_decompression_guard_returns_zero_dims():
-    data = make_png_bytes(200, 200)
-    w, h, fmt = pil_validate(data, max_pixels=10)
+def test_pil_validate_decompression_guard_returns_zero_dims(tmp_path):
+    path = tmp_path / "big.png"
+    path.write_bytes(make_png_bytes(200, 200))
+    w, h, fmt = pil_validate(path, max_pixels=10)
     assert (w, h, fmt) == (0, 0, "")
 
 
 @pytest.mark.anyio
-async def test_validate_success_png():
+async def test_validate_success_png(tmp_path):
     data = make_png_bytes()
     uf = make_upload("ok.png", data, "image/png")
+    dest = tmp_path / "ok.png"
 
-    v = await validate(uf)
+    v = await validate(uf, dest)
     assert v.ext == ".png"
     assert v.mime == "image/png"
     assert v.width > 0 and v.height > 0
-    assert len(v.sha256) == 64
+    assert v.size == len(data)
+    assert v.sha256 == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
 
 
 @pytest.mark.anyio
-async def test_validate_bad_extension():
+async def test_validate_bad_extension(tmp_path):
     data = make_png_bytes()
     uf = make_upload("bad.txt", data, "image/png")
 
     with pytest.raises(HTTPException) as e:
-        await validate(uf)
+        await validate(uf, tmp_path / "bad.txt")
     assert e.value.status_code == 400
 
 
 @pytest.mark.anyio
-async def test_validate_bad_signature():
+async def test_validate_bad_signature(tmp_path):
     uf = make_upload("x.png", b"notapng", "image/png")
+    dest = tmp_path / "x.png"
 
     with pytest.raises(HTTPException) as e:
-        await validate(uf)
-    assert "File bytes do not match" in str(e.value.detail)
\ No newline at end of file
+        await validate(uf, dest)
+    assert "File bytes do not match" in str(e.value.detail)
+    assert not dest.exists()
+
+@pytest.mark.anyio
+async def test_validate_strict_verifies_with_pillow(tmp_path):
+    data = make_jpg_bytes(20, 15)
+    uf = make_upload("ok.jpg", data, "image/jpeg")
+
+    v = await validate(uf, tmp_path / "ok.jpg", strict=True)
+    assert (v.width, v.height, v.format) == (20, 15, "jpeg")
+
+
+@pytest.mark.anyio
+async def test_validate_rejects_unopenable_image_with_valid_header(tmp_path):
+    # signature + IHDR parse fine, but Pillow cannot open what follows
+    data = make_png_bytes(50, 50)[:33] + b"\x00" * 256
+    uf = make_upload("zeros.png", data, "image/png")
+    dest = tmp_path / "zeros.png"
+
+    with pytest.raises(HTTPException) as e:
+        await validate(uf, dest)
+    assert e.value.status_code == 400
+    assert not dest.exists()
@@ -0,0 +1,11 @@
+from rq.utils import import_attribute
+from rq.worker import SimpleWorker
+
+from app.worker_boot import worker_pool_command
+
+
+def test_worker_pool_keeps_model_between_jobs():
+    # a forking worker would load BLIP again for every job
+    cmd = worker_pool_command("redis://localhost:6379/0")
+    worker_class = cmd[cmd.index("-w") + 1]
+    assert import_attribute(worker_class) is SimpleWorker